@@ -0,0 +1,40 @@
+import threading
+
+import numpy as np
+from numba import config, njit, prange
+
+# Streamlit runs scripts on worker threads; a parallel kernel launched from one under the
+# TBB layer can hang the interpreter at exit, so prefer OpenMP and keep TBB last
+config.THREADING_LAYER_PRIORITY = ["omp", "workqueue", "tbb"]
+
+# The workqueue fallback is not safe for concurrent launches, so sessions take turns
+_launch_lock = threading.Lock()
+
+
+# Fused IQR outlier kernel: per column, the quartiles and fences, then one scan that counts
+# outliers and clears keep[i] for their rows. Every writer stores the same False, so the
+# shared keep array needs no synchronisation across columns.
+@njit(parallel=True, cache=True)
+def _iqr_outliers(values):
+    n_rows, n_cols = values.shape
+    keep = np.ones(n_rows, dtype=np.bool_)
+    counts = np.zeros(n_cols, dtype=np.int64)
+    for j in prange(n_cols):
+        q = np.nanquantile(values[:, j], np.array([0.25, 0.75]))
+        iqr = q[1] - q[0]
+        lower = q[0] - 1.5 * iqr
+        upper = q[1] + 1.5 * iqr
+        count = 0
+        for i in range(n_rows):
+            if values[i, j] < lower or values[i, j] > upper:
+                count += 1
+                keep[i] = False
+        counts[j] = count
+    return counts, keep
+
+
+# Per-column outlier counts and the mask of rows to keep for a 2-D float64 array.
+# The first call compiles the kernel (cached on disk next to this module afterwards).
+def iqr_outliers(values):
+    with _launch_lock:
+        return _iqr_outliers(values)